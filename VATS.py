@@ -1,13 +1,13 @@
 import datetime
-import json
-import os
 import sys
+import time
 
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QColor, QIcon
 from PyQt6.QtWidgets import (
     QApplication,
     QCheckBox,
+    QComboBox,
     QDialog,
     QHBoxLayout,
     QHeaderView,
@@ -15,68 +15,50 @@ from PyQt6.QtWidgets import (
     QMainWindow,
     QMessageBox,
     QPushButton,
+    QStackedWidget,
     QTableWidget,
     QTableWidgetItem,
+    QTreeWidget,
+    QTreeWidgetItem,
     QVBoxLayout,
     QWidget,
 )
 
+import metrics
+import startup
 from config import (
+    ACCOUNT_TREE_COLUMNS,
     COLOR_SUGGESTED,
-    DATA_FILE,
-    DEFAULT_PRIORITY,
     DEFAULT_STYLE,
+    METRICS_PORT,
+    METRICS_TEXTFILE,
+    METRICS_TEXTFILE_INTERVAL_MS,
     NO_AVAILABLE_STYLE,
     SUGGESTED_STYLE,
     TABLE_COLUMN_COUNT,
     TABLE_COLUMNS,
 )
-from dialogs import (
-    AddHeadsetDialog,
-    EditHeadsetDialog,
-    Headset,
-    PriorityDialog,
-)
+from models import Headset
+from scoring import best_headset, create_policy, parse_timestamp
+from sites import SiteRegistry
 
+startup.mark("imports_done")
+
+# Load the initial inventory even if the first paint never arrives
+INITIAL_LOAD_FALLBACK_MS = 500
+
+
+# ---------------- COLORS ----------------
+_qcolors = {}
 
-# ---------------- DATA HELPERS ----------------
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        sample_data = [
-            {
-                "id": "Quest3-001",
-                "model": "Quest3",
-                "account_id": "demo_account_1",
-                "last_used": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                "in_use": False,
-            },
-            {
-                "id": "Quest2-001",
-                "model": "Quest2",
-                "account_id": "demo_account_2",
-                "last_used": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                "in_use": False,
-            },
-            {
-                "id": "HTC-001",
-                "model": "HTC_Vive_XR",
-                "account_id": "demo_account_3",
-                "last_used": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                "in_use": False,
-            },
-        ]
-
-        save_data(sample_data)
-        return sample_data
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
-
-
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
 
+def qcolor(rgb):
+    if rgb not in _qcolors:
+        _qcolors[rgb] = QColor(*rgb)
+    return _qcolors[rgb]
 
+
+# ---------------- DATA HELPERS ----------------
 def get_used_accounts(headsets):
     return {h["account_id"] for h in headsets if h["in_use"]}
 
@@ -93,46 +75,60 @@ def filter_headsets(headsets, hide_account_in_use=False):
     ]
 
 
-# Not used for now
-# todo: make search by id work for long lists
-# def find_headset_by_id(headsets, headset_id):
-#     for i, h in enumerate(headsets):
-#         if h["id"] == headset_id:
-#             return i, h
-#     return None, None
-
-
 # ---------------- LOGIC ----------------
-def suggest_headset(headsets):
-    used_accounts = get_used_accounts(headsets)
+def suggest_headset(headsets, policy=None, versions=None):
+    if policy is None:
+        policy = create_policy()
+
+    return best_headset(headsets, policy, versions=versions)
+
+
+def validate_headset_operation(headset_data, used_accounts):
+    if headset_data["in_use"]:
+        metrics.CONFLICTS.inc(reason="in_use")
+        return False, "Headset is already in use"
+    if headset_data["account_id"] in used_accounts:
+        metrics.CONFLICTS.inc(reason="account_in_use")
+        return (
+            False,
+            f"Account {headset_data['account_id']} already in use! Can't use {headset_data['id']}.",
+        )
+    return True, None
 
-    available = [
-        h for h in headsets if not h["in_use"] and h["account_id"] not in used_accounts
-    ]
 
-    if not available:
-        return None
+def checkout_headset(headset_data):
+    metrics.CHECKOUTS.inc()
+    headset_data["in_use"] = True
+    headset_data["last_used"] = datetime.datetime.now(
+        datetime.timezone.utc
+    ).isoformat()
 
-    def get_priority(headset):
-        if "custom_priority" in headset:
-            return headset["custom_priority"]
-        return DEFAULT_PRIORITY.get(headset["model"], 999)
 
-    available.sort(key=lambda h: (get_priority(h), h["last_used"]))
-    return available[0]
+def return_headset(headset_data):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    checked_out = parse_timestamp(headset_data["last_used"])
+    elapsed = max((now - checked_out).total_seconds(), 0) if checked_out else 0
+    metrics.RETURNS.inc()
+    headset_data["in_use"] = False
+    headset_data["last_returned"] = now.isoformat()
+    headset_data["total_use_seconds"] = (
+        headset_data.get("total_use_seconds", 0) + elapsed
+    )
 
 
 # ---------------- MAIN GUI ----------------
 class HeadsetManager(QMainWindow):
-    def __init__(self):
+    def __init__(self, sites=None):
         super().__init__()
-        self.setWindowTitle("VATS")
         self.resize(750, 450)
 
         self.setWindowIcon(QIcon.fromTheme("applications-games", QIcon()))
 
-        self.data = load_data()
+        self.sites = sites or SiteRegistry()
+        self.policy = self.sites.policy
+        self.shard = self.sites.select()
         self.hide_account_in_use = False
+        self.update_window_title()
 
         # Layout
         layout = QVBoxLayout()
@@ -142,7 +138,20 @@ class HeadsetManager(QMainWindow):
         self.hide_filter_checkbox = QCheckBox("Hide 'Account in Use' headsets")
         self.hide_filter_checkbox.stateChanged.connect(self.toggle_filter)
         filter_layout.addWidget(self.hide_filter_checkbox)
+        self.group_checkbox = QCheckBox("Group by account")
+        self.group_checkbox.stateChanged.connect(self.toggle_grouping)
+        filter_layout.addWidget(self.group_checkbox)
         filter_layout.addStretch()
+        if self.sites.sharded:
+            self.site_combo = QComboBox()
+            self.site_combo.addItems(self.sites.names)
+            self.site_combo.setCurrentText(self.shard.name)
+            self.site_combo.currentTextChanged.connect(self.select_site)
+            find_btn = QPushButton("Find Anywhere")
+            find_btn.clicked.connect(self.find_anywhere)
+            filter_layout.addWidget(QLabel("Site:"))
+            filter_layout.addWidget(self.site_combo)
+            filter_layout.addWidget(find_btn)
         layout.addLayout(filter_layout)
 
         # Suggested headset banner
@@ -165,7 +174,24 @@ class HeadsetManager(QMainWindow):
             QHeaderView.ResizeMode.Stretch
         )
 
-        layout.addWidget(self.table)
+        # Account tree, filled in the first time it is shown
+        self.account_tree = QTreeWidget()
+        self.account_tree.setColumnCount(len(ACCOUNT_TREE_COLUMNS))
+        self.account_tree.setHeaderLabels(ACCOUNT_TREE_COLUMNS)
+        self.account_tree.setSelectionMode(
+            QTreeWidget.SelectionMode.ExtendedSelection
+        )
+        self.account_tree.itemDoubleClicked.connect(self.toggle_tree_item)
+        self.account_tree.header().setSectionResizeMode(
+            QHeaderView.ResizeMode.Stretch
+        )
+        self.account_items = {}
+        self.account_tree_index = None
+
+        self.views = QStackedWidget()
+        self.views.addWidget(self.table)
+        self.views.addWidget(self.account_tree)
+        layout.addWidget(self.views)
 
         # Buttons
         button_layout = QHBoxLayout()
@@ -197,18 +223,61 @@ class HeadsetManager(QMainWindow):
         container.setLayout(layout)
         self.setCentralWidget(container)
 
+        # The inventory is loaded after the first frame is on screen
+        self.initial_load_done = False
+        self.first_paint_done = False
+        self.suggest_label.setText("Loading headsets...")
+        QTimer.singleShot(INITIAL_LOAD_FALLBACK_MS, self.load_initial_data)
+        startup.mark("window_built")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            startup.mark("first_paint")
+            QTimer.singleShot(0, self.load_initial_data)
+
+    def load_initial_data(self):
+        if self.initial_load_done:
+            return
+        self.initial_load_done = True
         self.refresh()
+        startup.mark("data_loaded")
+
+    @property
+    def data(self):
+        return self.shard.headsets
 
     # -------- Helper Methods --------
+    def update_window_title(self):
+        if self.sites.sharded:
+            self.setWindowTitle(f"VATS - {self.shard.name}")
+        else:
+            self.setWindowTitle("VATS")
+
     def create_table_item(
         self, text, alignment=Qt.AlignmentFlag.AlignLeft, background=None
     ):
         item = QTableWidgetItem(text)
         item.setTextAlignment(alignment)
         if background:
-            item.setBackground(background)
+            item.setBackground(qcolor(background))
         return item
 
+    def selected_headsets(self):
+        """Headsets selected in whichever view is showing"""
+        if self.views.currentWidget() is self.account_tree:
+            # Group rows carry no headset id and are skipped
+            ids = [
+                item.data(0, Qt.ItemDataRole.UserRole)
+                for item in self.account_tree.selectedItems()
+            ]
+            return [self.shard.find(i) for i in ids if i is not None]
+
+        filtered_data = filter_headsets(self.data, self.hide_account_in_use)
+        rows = [index.row() for index in self.table.selectionModel().selectedRows()]
+        return [filtered_data[row] for row in rows if row < len(filtered_data)]
+
     def update_suggestion_banner(self, suggestion):
         if suggestion:
             self.suggest_label.setText(
@@ -243,29 +312,84 @@ class HeadsetManager(QMainWindow):
 
         if headset.id == suggested_id:
             for col in range(TABLE_COLUMN_COUNT):
-                self.table.item(row, col).setBackground(COLOR_SUGGESTED)
+                self.table.item(row, col).setBackground(qcolor(COLOR_SUGGESTED))
 
-    def validate_headset_operation(self, headset_data, used_accounts):
-        if headset_data["in_use"]:
-            return False, "Headset is already in use"
-        if headset_data["account_id"] in used_accounts:
-            return (
-                False,
-                f"Account {headset_data['account_id']} already in use! Can't use {headset_data['id']}.",
+    def populate_account_group(self, account_id):
+        summary = self.shard.accounts.get(account_id)
+        item = self.account_items.get(account_id)
+
+        if summary is None:
+            if item is not None:
+                index = self.account_tree.indexOfTopLevelItem(item)
+                self.account_tree.takeTopLevelItem(index)
+                del self.account_items[account_id]
+            return
+
+        if item is None:
+            item = QTreeWidgetItem(self.account_tree)
+            self.account_items[account_id] = item
+
+        available = sorted(summary.available_models.items())
+        models = ", ".join(f"{model} x{count}" for model, count in available)
+        item.setText(0, account_id)
+        item.setText(1, str(summary.total))
+        item.setText(2, summary.holder or "")
+        item.setText(3, models)
+        item.setText(4, summary.last_activity)
+
+        # Replacing children keeps the group's expanded state
+        used_accounts = {account_id} if summary.holder else set()
+        item.takeChildren()
+        for headset_id in sorted(summary.members):
+            headset = Headset(self.shard.find(headset_id))
+            status_text, status_color = headset.get_status_info(used_accounts)
+            child = QTreeWidgetItem(
+                [
+                    headset.id,
+                    headset.model,
+                    status_text,
+                    headset.get_priority_display(),
+                    headset.last_used,
+                ]
             )
-        return True, None
+            child.setData(0, Qt.ItemDataRole.UserRole, headset.id)
+            child.setBackground(2, qcolor(status_color))
+            item.addChild(child)
+
+    def update_account_tree(self):
+        accounts = self.shard.accounts
+        # A re-read shard has a new index, so rebuild instead of patching
+        if self.account_tree_index is not accounts:
+            if self.views.currentWidget() is not self.account_tree:
+                return
+            self.account_tree.clear()
+            self.account_items = {}
+            accounts.take_dirty()
+            for account_id in sorted(accounts.accounts):
+                self.populate_account_group(account_id)
+            self.account_tree_index = accounts
+            return
+
+        for account_id in accounts.take_dirty():
+            self.populate_account_group(account_id)
+
+    def validate_headset_operation(self, headset_data, used_accounts):
+        return validate_headset_operation(headset_data, used_accounts)
 
     def checkout_headset(self, headset_data):
-        headset_data["in_use"] = True
-        headset_data["last_used"] = datetime.datetime.now(
-            datetime.timezone.utc
-        ).isoformat()
+        checkout_headset(headset_data)
+        self.shard.touch(headset_data)
+
+    def return_headset(self, headset_data):
+        return_headset(headset_data)
+        self.shard.touch(headset_data)
 
     # -------- Core Logic --------
     def refresh(self):
+        started = time.perf_counter()
         filtered_data = filter_headsets(self.data, self.hide_account_in_use)
         used_accounts = get_used_accounts(self.data)
-        suggestion = suggest_headset(self.data)
+        suggestion = suggest_headset(self.data, self.policy, self.shard.versions)
         suggested_id = suggestion["id"] if suggestion else None
 
         self.table.setRowCount(len(filtered_data))
@@ -273,15 +397,48 @@ class HeadsetManager(QMainWindow):
             self.populate_table_row(row, headset_data, used_accounts, suggested_id)
 
         self.update_suggestion_banner(suggestion)
+        self.update_account_tree()
+
+        save_started = time.perf_counter()
+        self.sites.save(self.shard)
+        finished = time.perf_counter()
+        metrics.record_save(self.shard.name, self.shard.path, finished - save_started)
+        metrics.record_fleet(self.shard.name, self.shard.accounts)
+        metrics.REFRESH_SECONDS.observe(finished - started)
+
+    def select_site(self, name):
+        self.shard = self.sites.select(name)
+        self.update_window_title()
+        self.table.clearSelection()
+        self.refresh()
+
+    def find_anywhere(self):
+        site, headset_data = self.sites.find_available()
+        if headset_data is None:
+            QMessageBox.information(
+                self, "Find Anywhere", "No headsets are available at any site."
+            )
+            return
 
-        save_data(self.data)
+        QMessageBox.information(
+            self,
+            "Find Anywhere",
+            f"Next available headset: {headset_data['id']} ({headset_data['model']}) at {site}.",
+        )
+
+    def toggle_grouping(self, state):
+        if state == Qt.CheckState.Checked.value:
+            self.views.setCurrentWidget(self.account_tree)
+            self.update_account_tree()
+        else:
+            self.views.setCurrentWidget(self.table)
 
     def toggle_filter(self, state):
         self.hide_account_in_use = state == Qt.CheckState.Checked.value
         self.refresh()
 
     def set_priority(self):
-        selected = self.table.selectionModel().selectedRows()
+        selected = self.selected_headsets()
         if not selected:
             QMessageBox.warning(
                 self, "Warning", "Select a headset to set its priority."
@@ -294,38 +451,28 @@ class HeadsetManager(QMainWindow):
             )
             return
 
-        row = selected[0].row()
-        filtered_data = filter_headsets(self.data, self.hide_account_in_use)
+        headset_data = selected[0]
 
-        if row >= len(filtered_data):
-            return
-
-        headset_data = filtered_data[row]
+        from dialogs import PriorityDialog
 
         # Open priority dialog
         dialog = PriorityDialog(headset_data, self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             new_priority = dialog.get_priority()
             headset_data["custom_priority"] = new_priority
+            self.shard.touch(headset_data)
             self.refresh()
 
     def checkout_selected(self):
         """Checkout all selected headsets"""
-        selected = self.table.selectionModel().selectedRows()
+        selected = self.selected_headsets()
         if not selected:
             QMessageBox.warning(self, "Warning", "Select at least one headset.")
             return
 
-        filtered_data = filter_headsets(self.data, self.hide_account_in_use)
         used_accounts = get_used_accounts(self.data)
 
-        for idx in selected:
-            row = idx.row()
-            if row >= len(filtered_data):
-                continue
-
-            headset_data = filtered_data[row]
-
+        for headset_data in selected:
             is_valid, error_msg = self.validate_headset_operation(
                 headset_data, used_accounts
             )
@@ -340,21 +487,14 @@ class HeadsetManager(QMainWindow):
 
     def return_selected(self):
         """Return all selected headsets"""
-        selected = self.table.selectionModel().selectedRows()
+        selected = self.selected_headsets()
         if not selected:
             QMessageBox.warning(self, "Warning", "Select at least one headset.")
             return
 
-        filtered_data = filter_headsets(self.data, self.hide_account_in_use)
-
-        for idx in selected:
-            row = idx.row()
-            if row >= len(filtered_data):
-                continue
-
-            headset_data = filtered_data[row]
+        for headset_data in selected:
             if headset_data["in_use"]:
-                headset_data["in_use"] = False
+                self.return_headset(headset_data)
 
         self.refresh()
 
@@ -364,11 +504,19 @@ class HeadsetManager(QMainWindow):
         if row >= len(filtered_data):
             return
 
-        headset_data = filtered_data[row]
+        self.toggle_headset_data(filtered_data[row])
+
+    def toggle_tree_item(self, item, column):
+        # Group rows only expand/collapse
+        headset_id = item.data(0, Qt.ItemDataRole.UserRole)
+        if headset_id is not None:
+            self.toggle_headset_data(self.shard.find(headset_id))
+
+    def toggle_headset_data(self, headset_data):
         used_accounts = get_used_accounts(self.data)
 
         if headset_data["in_use"]:
-            headset_data["in_use"] = False
+            self.return_headset(headset_data)
         else:
             is_valid, error_msg = self.validate_headset_operation(
                 headset_data, used_accounts
@@ -381,6 +529,8 @@ class HeadsetManager(QMainWindow):
         self.refresh()
 
     def add_headset(self):
+        from dialogs import AddHeadsetDialog
+
         dialog = AddHeadsetDialog(self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             is_valid, error_msg = dialog.validate_input()
@@ -390,8 +540,7 @@ class HeadsetManager(QMainWindow):
 
             new_headset = dialog.get_headset_data()
 
-            existing_ids = {h["id"] for h in self.data}
-            if new_headset["id"] in existing_ids:
+            if self.shard.find(new_headset["id"]) is not None:
                 QMessageBox.warning(
                     self,
                     "Duplicate ID",
@@ -399,7 +548,7 @@ class HeadsetManager(QMainWindow):
                 )
                 return
 
-            self.data.append(new_headset)
+            self.shard.add(new_headset)
             self.refresh()
 
             QMessageBox.information(
@@ -409,24 +558,13 @@ class HeadsetManager(QMainWindow):
             )
 
     def remove_headset(self):
-        selected = self.table.selectionModel().selectedRows()
-        if not selected:
+        headsets_to_remove = self.selected_headsets()
+        if not headsets_to_remove:
             QMessageBox.warning(
                 self, "Warning", "Select at least one headset to remove."
             )
             return
 
-        filtered_data = filter_headsets(self.data, self.hide_account_in_use)
-        headsets_to_remove = []
-
-        for idx in selected:
-            row = idx.row()
-            if row < len(filtered_data):
-                headsets_to_remove.append(filtered_data[row])
-
-        if not headsets_to_remove:
-            return
-
         in_use_headsets = [h for h in headsets_to_remove if h["in_use"]]
         if in_use_headsets:
             in_use_ids = [h["id"] for h in in_use_headsets]
@@ -448,7 +586,9 @@ class HeadsetManager(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             ids_to_remove = {h["id"] for h in headsets_to_remove}
-            self.data = [h for h in self.data if h["id"] not in ids_to_remove]
+            for headset_id in ids_to_remove:
+                self.policy.forget(headset_id)
+            self.shard.remove(ids_to_remove)
             self.refresh()
 
             QMessageBox.information(
@@ -458,7 +598,7 @@ class HeadsetManager(QMainWindow):
             )
 
     def edit_headset(self):
-        selected = self.table.selectionModel().selectedRows()
+        selected = self.selected_headsets()
         if not selected:
             QMessageBox.warning(self, "Warning", "Select a headset to edit.")
             return
@@ -469,13 +609,7 @@ class HeadsetManager(QMainWindow):
             )
             return
 
-        filtered_data = filter_headsets(self.data, self.hide_account_in_use)
-        row = selected[0].row()
-
-        if row >= len(filtered_data):
-            return
-
-        headset_data = filtered_data[row]
+        headset_data = selected[0]
 
         if headset_data["in_use"]:
             QMessageBox.warning(
@@ -485,10 +619,11 @@ class HeadsetManager(QMainWindow):
             )
             return
 
+        from dialogs import EditHeadsetDialog
+
         dialog = EditHeadsetDialog(headset_data, self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            existing_ids = {h["id"] for h in self.data}
-            is_valid, error_msg = dialog.validate_input(existing_ids)
+            is_valid, error_msg = dialog.validate_input(self.shard.index)
 
             if not is_valid:
                 QMessageBox.warning(self, "Invalid Input", error_msg)
@@ -498,11 +633,12 @@ class HeadsetManager(QMainWindow):
 
             updated_headset["in_use"] = headset_data["in_use"]
             updated_headset["last_used"] = headset_data["last_used"]
+            for key in ("last_returned", "total_use_seconds"):
+                if key in headset_data:
+                    updated_headset[key] = headset_data[key]
+            self.policy.forget(headset_data["id"])
 
-            for i, h in enumerate(self.data):
-                if h["id"] == headset_data["id"]:
-                    self.data[i] = updated_headset
-                    break
+            self.shard.replace(headset_data["id"], updated_headset)
 
             self.refresh()
 
@@ -518,4 +654,23 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = HeadsetManager()
     window.show()
+
+    # Metrics are optional; an export failure must never take the kiosk down
+    if METRICS_PORT:
+        try:
+            metrics.start_http_server(METRICS_PORT)
+        except OSError as e:
+            print(f"Metrics server disabled on port {METRICS_PORT}: {e}", file=sys.stderr)
+    if METRICS_TEXTFILE:
+
+        def export_metrics():
+            try:
+                metrics.write_textfile(METRICS_TEXTFILE)
+            except OSError as e:
+                print(f"Could not write {METRICS_TEXTFILE}: {e}", file=sys.stderr)
+
+        metrics_timer = QTimer()
+        metrics_timer.timeout.connect(export_metrics)
+        metrics_timer.start(METRICS_TEXTFILE_INTERVAL_MS)
+
     sys.exit(app.exec())
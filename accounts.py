@@ -0,0 +1,124 @@
+# ---------------- ACCOUNT AGGREGATES ----------------
+class AccountSummary:
+    """Aggregates for one account, updated one headset at a time"""
+
+    def __init__(self, account_id):
+        self.account_id = account_id
+        self.members = {}  # headset id -> (model, in_use, last activity)
+        self.holders = set()
+        self.idle_models = {}
+        self.last_activity = ""
+
+    @property
+    def total(self):
+        return len(self.members)
+
+    @property
+    def holder(self):
+        return min(self.holders) if self.holders else None
+
+    @property
+    def available_models(self):
+        # Idle units of a held account are blocked, not available
+        if self.holders:
+            return {}
+        return dict(self.idle_models)
+
+    @property
+    def blocked(self):
+        return bool(self.holders and self.idle_models)
+
+    def add(self, headset_id, entry):
+        model, in_use, activity = entry
+        self.members[headset_id] = entry
+        if in_use:
+            self.holders.add(headset_id)
+        else:
+            self.idle_models[model] = self.idle_models.get(model, 0) + 1
+        if activity > self.last_activity:
+            self.last_activity = activity
+
+    def remove(self, headset_id):
+        model, in_use, activity = self.members.pop(headset_id)
+        if in_use:
+            self.holders.discard(headset_id)
+        else:
+            self.idle_models[model] -= 1
+            if not self.idle_models[model]:
+                del self.idle_models[model]
+        if activity == self.last_activity:
+            # Only this account's members are rescanned
+            self.last_activity = max(
+                (entry[2] for entry in self.members.values()), default=""
+            )
+
+
+class AccountIndex:
+    """Per-account aggregates for a list of headsets.
+
+    Call ``apply`` whenever a headset is added or changes state and
+    ``discard`` when it is removed; ``take_dirty`` returns the accounts
+    touched since the last call so views can update just those groups.
+    Fleet-wide ``available_by_model`` and ``blocked_count`` are adjusted
+    by the touched account's contribution only.
+    """
+
+    def __init__(self, headsets=()):
+        self.accounts = {}
+        self.dirty = set()
+        self.available_by_model = {}
+        self.blocked_count = 0
+        self._account_of = {}
+        for headset_data in headsets:
+            self.apply(headset_data)
+
+    def get(self, account_id):
+        return self.accounts.get(account_id)
+
+    def apply(self, headset_data):
+        self.discard(headset_data["id"])
+
+        account_id = headset_data["account_id"]
+        activity = max(
+            headset_data.get("last_used") or "",
+            headset_data.get("last_returned") or "",
+        )
+        entry = (headset_data["model"], headset_data["in_use"], activity)
+
+        summary = self.accounts.get(account_id)
+        if summary is None:
+            summary = self.accounts[account_id] = AccountSummary(account_id)
+        self._count(summary, -1)
+        summary.add(headset_data["id"], entry)
+        self._count(summary, 1)
+        self._account_of[headset_data["id"]] = account_id
+        self.dirty.add(account_id)
+
+    def discard(self, headset_id):
+        account_id = self._account_of.pop(headset_id, None)
+        if account_id is None:
+            return
+        summary = self.accounts[account_id]
+        self._count(summary, -1)
+        summary.remove(headset_id)
+        self._count(summary, 1)
+        if not summary.members:
+            del self.accounts[account_id]
+        self.dirty.add(account_id)
+
+    def _count(self, summary, sign):
+        for model, count in summary.available_models.items():
+            total = self.available_by_model.get(model, 0) + sign * count
+            if total:
+                self.available_by_model[model] = total
+            else:
+                self.available_by_model.pop(model, None)
+        if summary.blocked:
+            self.blocked_count += sign
+
+    def blocked_accounts(self):
+        return [summary for summary in self.accounts.values() if summary.blocked]
+
+    def take_dirty(self):
+        dirty, self.dirty = self.dirty, set()
+        return dirty
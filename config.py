@@ -1,20 +1,34 @@
-from PyQt6.QtGui import QColor
+import os
 
 # File configuration
 DATA_FILE = "headsets.json"
 
+# Site/room shards: name -> data file. Leave empty to keep every headset in DATA_FILE
+SITES = {}
+# Shard a kiosk opens on; set VATS_SITE to pin a kiosk to its room
+DEFAULT_SITE = os.environ.get("VATS_SITE")
+# Per-site availability summaries used for cross-site lookups
+SITE_SUMMARY_FILE = "site_summaries.json"
+
 # Default priority order: smaller number = higher priority
 DEFAULT_PRIORITY = {"Quest3": 1, "Quest2": 2, "HTC_Vive_XR": 3}
 
-# Colors for different states RGB
-COLOR_IN_USE = QColor(255, 120, 120)
-COLOR_AVAILABLE = QColor(120, 255, 120)
-COLOR_ACCOUNT_BLOCKED = QColor(255, 140, 0)
-COLOR_SUGGESTED = QColor(120, 255, 120)
+# Colors for different states RGB, turned into QColors when first drawn
+COLOR_IN_USE = (255, 120, 120)
+COLOR_AVAILABLE = (120, 255, 120)
+COLOR_ACCOUNT_BLOCKED = (255, 140, 0)
+COLOR_SUGGESTED = (120, 255, 120)
 
 # UI Constants
 TABLE_COLUMNS = ["ID", "Model", "Account", "Status", "Priority"]
 TABLE_COLUMN_COUNT = len(TABLE_COLUMNS)
+ACCOUNT_TREE_COLUMNS = [
+    "Account / ID",
+    "Units / Model",
+    "In Use By / Status",
+    "Available Models / Priority",
+    "Last Activity",
+]
 SUGGESTED_STYLE = (
     "background: #dfffd6; color: black; font-size: 16px; font-weight: bold;"
 )
@@ -27,3 +41,29 @@ DEFAULT_STYLE = "font-size: 16px; font-weight: bold; padding: 8px;"
 STATUS_IN_USE = "In Use"
 STATUS_ACCOUNT_IN_USE = "Account in use"
 STATUS_AVAILABLE = "Available"
+
+# Suggestion scoring policy: "priority", "wear_leveling", "cooldown", "time_of_day"
+SCORING_POLICY = "priority"
+SCORING_POLICY_PARAMS = {
+    # Headsets whose cumulative usage falls in the same bucket rank by priority
+    "wear_leveling": {"bucket_hours": 1},
+    # Headsets returned within this many minutes are suggested last
+    "cooldown": {"minutes": 15},
+    # (start_hour, end_hour, preferred models) in local time, end exclusive
+    "time_of_day": {
+        "schedule": [
+            (8, 12, ["Quest3"]),
+            (12, 17, ["Quest2", "Quest3"]),
+            (17, 24, ["HTC_Vive_XR"]),
+        ]
+    },
+}
+
+# Time from launch to first paint a kiosk must stay under (see startup.py)
+STARTUP_BUDGET_MS = 1500
+
+# Metrics: Prometheus text at http://127.0.0.1:<port>/metrics, None disables
+METRICS_PORT = None
+# Periodically written copy for node_exporter's textfile collector, None disables
+METRICS_TEXTFILE = None
+METRICS_TEXTFILE_INTERVAL_MS = 15000
@@ -0,0 +1,460 @@
+"""Trace-replay load test for VATS.
+
+Generates (or reads) a day of kiosk traffic and replays it through the core
+logic or an offscreen ``HeadsetManager``, optionally from several kiosk
+processes sharing one data file. Reports p50/p95/p99 latency per operation
+(applied events only), bytes written to disk and peak RSS.
+
+    python loadtest.py --headsets 200 --events 5000 --kiosks 3 --mode gui
+    python loadtest.py --write-trace day.jsonl
+    python loadtest.py --trace day.jsonl
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PyQt6.QtWidgets import QApplication
+
+from sites import SiteRegistry, file_lock, load_data, save_data
+from VATS import (
+    HeadsetManager,
+    checkout_headset,
+    get_used_accounts,
+    return_headset,
+    suggest_headset,
+    validate_headset_operation,
+)
+
+OPERATIONS = ("checkout", "return", "toggle", "priority", "add", "remove")
+MODELS = ("Quest3", "Quest2", "HTC_Vive_XR")
+
+# Relative weight of each operation in a generated trace
+OPERATION_WEIGHTS = {
+    "checkout": 40,
+    "return": 38,
+    "toggle": 12,
+    "priority": 5,
+    "add": 3,
+    "remove": 2,
+}
+
+DAY_START = 8 * 3600
+DAY_END = 18 * 3600
+RUSH_START = 9 * 3600
+RUSH_END = 9 * 3600 + 1800
+# The 9:00-9:30 rush gets this many times the normal traffic rate
+RUSH_FACTOR = 8
+
+
+# ---------------- TRACE ----------------
+def time_now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def make_fleet(count, units_per_account=2):
+    now = "2024-01-01T08:00:00+00:00"
+    return [
+        {
+            "id": f"{MODELS[i % len(MODELS)]}-{i:04d}",
+            "model": MODELS[i % len(MODELS)],
+            "account_id": f"account_{i // units_per_account}",
+            "last_used": now,
+            "in_use": False,
+        }
+        for i in range(count)
+    ]
+
+
+def event_times(count, rng):
+    """Seconds since midnight, denser during the morning rush"""
+    rush = (RUSH_END - RUSH_START) * RUSH_FACTOR
+    normal = (DAY_END - DAY_START) - (RUSH_END - RUSH_START)
+    times = []
+    for _ in range(count):
+        if rng.random() < rush / (rush + normal):
+            times.append(rng.uniform(RUSH_START, RUSH_END))
+        else:
+            t = rng.uniform(DAY_START, DAY_END - (RUSH_END - RUSH_START))
+            times.append(t if t < RUSH_START else t + (RUSH_END - RUSH_START))
+    return sorted(times)
+
+
+def kiosk_trace(fleet, count, kiosk, rng, next_id, conflict_rate=0.0):
+    """Events for one kiosk that stay valid against its fleet as it evolves.
+
+    Checkouts only pick idle units whose account is not already held,
+    except for a ``conflict_rate`` share that deliberately targets a held
+    account and should be rejected on replay.
+    """
+    account_of = {h["id"]: h["account_id"] for h in fleet}
+    in_use = {h["id"] for h in fleet if h["in_use"]}
+    idle = set(account_of) - in_use
+    held = {}  # account id -> units of it in use
+    for headset_id in in_use:
+        held[account_of[headset_id]] = held.get(account_of[headset_id], 0) + 1
+    ids = list(account_of)
+    operations = list(OPERATION_WEIGHTS)
+    weights = list(OPERATION_WEIGHTS.values())
+
+    def hold(headset_id):
+        idle.discard(headset_id)
+        in_use.add(headset_id)
+        held[account_of[headset_id]] = held.get(account_of[headset_id], 0) + 1
+
+    def release(headset_id):
+        in_use.discard(headset_id)
+        idle.add(headset_id)
+        held[account_of[headset_id]] -= 1
+        if not held[account_of[headset_id]]:
+            del held[account_of[headset_id]]
+
+    trace = []
+    for t in event_times(count, rng):
+        op = rng.choices(operations, weights)[0]
+        event = {"t": round(t, 3), "op": op, "kiosk": kiosk}
+
+        if op in ("checkout", "toggle"):
+            blocked = [i for i in sorted(idle) if account_of[i] in held]
+            if blocked and rng.random() < conflict_rate:
+                headset_id = rng.choice(blocked)
+            else:
+                candidates = [i for i in sorted(idle) if account_of[i] not in held]
+                if op == "toggle":
+                    candidates += sorted(in_use)
+                if not candidates:
+                    continue
+                headset_id = rng.choice(candidates)
+                if headset_id in in_use:
+                    release(headset_id)
+                else:
+                    hold(headset_id)
+        elif op == "return" and in_use:
+            headset_id = rng.choice(sorted(in_use))
+            release(headset_id)
+        elif op == "add":
+            model = rng.choice(MODELS)
+            headset_id = f"{model}-{next_id:04d}"
+            event["model"] = model
+            event["account_id"] = f"account_{next_id // 2}"
+            next_id += 1
+            account_of[headset_id] = event["account_id"]
+            ids.append(headset_id)
+            idle.add(headset_id)
+        elif op == "remove" and idle:
+            headset_id = rng.choice(sorted(idle))
+            idle.discard(headset_id)
+            ids.remove(headset_id)
+            del account_of[headset_id]
+        elif op == "priority" and ids:
+            headset_id = rng.choice(ids)
+            event["priority"] = rng.randint(1, 10)
+        else:
+            continue
+
+        event["id"] = headset_id
+        trace.append(event)
+    return trace
+
+
+def generate_trace(fleet, count, kiosks=1, seed=0, conflict_rate=0.0):
+    """A day of traffic split across ``kiosks``, ordered by time.
+
+    Each kiosk works its own accounts of the fleet, so its events stay
+    valid however the kiosk processes interleave, and account conflicts
+    never span kiosks.
+    """
+    accounts = sorted({h["account_id"] for h in fleet})
+    owner = {account_id: i % kiosks for i, account_id in enumerate(accounts)}
+    # Each kiosk numbers its added headsets (and their accounts) in its own range
+    first_id = len(fleet) + len(fleet) % 2
+    id_range = count + count % 2
+
+    trace = []
+    for kiosk in range(kiosks):
+        trace.extend(
+            kiosk_trace(
+                [h for h in fleet if owner[h["account_id"]] == kiosk],
+                count // kiosks + (kiosk < count % kiosks),
+                kiosk,
+                random.Random(f"{seed}-{kiosk}"),
+                first_id + kiosk * id_range,
+                conflict_rate,
+            )
+        )
+    return sorted(trace, key=lambda event: event["t"])
+
+
+def read_trace(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_trace(trace, path):
+    with open(path, "w") as f:
+        for event in trace:
+            f.write(json.dumps(event) + "\n")
+
+
+# ---------------- DRIVERS ----------------
+class CoreDriver:
+    """Applies events with the app's logic and saves like a refresh does.
+
+    With ``shared`` set, other kiosk processes write the same file, so
+    each event re-reads it under a lock before applying and saving.
+    """
+
+    def __init__(self, path, shared=False):
+        self.sites = SiteRegistry(sites={"loadtest": path})
+        self.shard = self.sites.get()
+        self.shared = shared
+        self.bytes_written = 0
+
+    def after_change(self):
+        suggest_headset(self.shard.headsets, self.sites.policy, self.shard.versions)
+        self.sites.save(self.shard)
+        self.bytes_written += os.path.getsize(self.shard.path)
+
+    def checkout(self, headset_data):
+        checkout_headset(headset_data)
+        self.shard.touch(headset_data)
+
+    def return_(self, headset_data):
+        return_headset(headset_data)
+        self.shard.touch(headset_data)
+
+    def apply(self, event):
+        """Replay one event; returns "ok", "rejected" or "skipped" """
+        if not self.shared:
+            return self.apply_event(event)
+        with file_lock(self.shard.path):
+            self.shard.unload()
+            return self.apply_event(event)
+
+    def apply_event(self, event):
+        op = event["op"]
+        if op == "add":
+            if self.shard.find(event["id"]) is not None:
+                return "skipped"
+            self.shard.add(
+                {
+                    "id": event["id"],
+                    "model": event["model"],
+                    "account_id": event["account_id"],
+                    "last_used": time_now(),
+                    "in_use": False,
+                }
+            )
+            self.after_change()
+            return "ok"
+
+        headset_data = self.shard.find(event["id"])
+        if headset_data is None:
+            return "skipped"
+
+        if op == "checkout" or (op == "toggle" and not headset_data["in_use"]):
+            used_accounts = get_used_accounts(self.shard.headsets)
+            is_valid, _ = validate_headset_operation(headset_data, used_accounts)
+            if not is_valid:
+                return "rejected"
+            self.checkout(headset_data)
+        elif op in ("return", "toggle"):
+            if not headset_data["in_use"]:
+                return "rejected"
+            self.return_(headset_data)
+        elif op == "priority":
+            headset_data["custom_priority"] = event["priority"]
+            self.shard.touch(headset_data)
+        elif op == "remove":
+            if headset_data["in_use"]:
+                return "rejected"
+            self.sites.policy.forget(event["id"])
+            self.shard.remove({event["id"]})
+
+        self.after_change()
+        return "ok"
+
+
+class GuiDriver(CoreDriver):
+    """Same events, but every change goes through an offscreen window"""
+
+    def __init__(self, path, shared=False):
+        super().__init__(path, shared)
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        self.app = QApplication.instance() or QApplication([])
+        self.window = HeadsetManager(self.sites)
+        self.window.initial_load_done = True
+        self.window.refresh()
+
+    def after_change(self):
+        self.window.refresh()
+        self.app.processEvents()
+        self.bytes_written += os.path.getsize(self.shard.path)
+
+    def checkout(self, headset_data):
+        self.window.checkout_headset(headset_data)
+
+    def return_(self, headset_data):
+        self.window.return_headset(headset_data)
+
+
+DRIVERS = {"core": CoreDriver, "gui": GuiDriver}
+
+
+# ---------------- REPLAY ----------------
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def replay(trace, path, mode="core", speed=0, shared=False):
+    """Replay events in order; ``speed`` > 0 keeps their spacing at that rate"""
+    driver = DRIVERS[mode](path, shared)
+    latencies = {op: [] for op in OPERATIONS}
+    outcomes = {"ok": 0, "rejected": 0, "skipped": 0}
+
+    started = time.perf_counter()
+    first = trace[0]["t"] if trace else 0
+    for event in trace:
+        if speed > 0:
+            delay = (event["t"] - first) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        begin = time.perf_counter()
+        outcome = driver.apply(event)
+        elapsed = time.perf_counter() - begin
+        # Rejected and skipped events return before saving; keep them out
+        if outcome == "ok":
+            latencies[event["op"]].append(elapsed)
+        outcomes[outcome] += 1
+
+    return {
+        "latencies": latencies,
+        "outcomes": outcomes,
+        "bytes_written": driver.bytes_written,
+        "peak_rss": peak_rss_bytes(),
+    }
+
+
+def replay_kiosk(args):
+    trace, path, mode, speed = args
+    return replay(trace, path, mode, speed, shared=True)
+
+
+def run(trace, fleet, kiosks=1, mode="core", speed=0):
+    """Replay ``trace`` against a fresh copy of ``fleet`` and merge results"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "headsets.json")
+        save_data(fleet, path)
+
+        if kiosks == 1:
+            results = [replay(trace, path, mode, speed)]
+        else:
+            import multiprocessing
+
+            jobs = []
+            for kiosk in range(kiosks):
+                # Generated traces keep each kiosk's events consistent on their own
+                events = [e for e in trace if e.get("kiosk", 0) % kiosks == kiosk]
+                jobs.append((events, path, mode, speed))
+            with multiprocessing.get_context("spawn").Pool(kiosks) as pool:
+                results = pool.map(replay_kiosk, jobs)
+
+    merged = {
+        "latencies": {op: [] for op in OPERATIONS},
+        "outcomes": {"ok": 0, "rejected": 0, "skipped": 0},
+        "bytes_written": 0,
+        "peak_rss": None,
+    }
+    for result in results:
+        for op, values in result["latencies"].items():
+            merged["latencies"][op].extend(values)
+        for outcome, count in result["outcomes"].items():
+            merged["outcomes"][outcome] += count
+        merged["bytes_written"] += result["bytes_written"]
+        if result["peak_rss"] is not None:
+            merged["peak_rss"] = max(merged["peak_rss"] or 0, result["peak_rss"])
+    return merged
+
+
+# ---------------- REPORT ----------------
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def print_report(result):
+    print(f"{'operation':<10}{'applied':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op in OPERATIONS:
+        values = result["latencies"][op]
+        if not values:
+            continue
+        p50, p95, p99 = (percentile(values, p) * 1000 for p in (50, 95, 99))
+        print(f"{op:<10}{len(values):>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}")
+
+    outcomes = result["outcomes"]
+    print(
+        f"\n{outcomes['ok']} applied, {outcomes['rejected']} rejected, "
+        f"{outcomes['skipped']} skipped (headset missing)"
+    )
+    print(f"Disk written: {result['bytes_written'] / 1024 / 1024:.1f} MiB")
+    if result["peak_rss"] is None:
+        print("Peak RSS: unavailable on this platform")
+    else:
+        print(f"Peak RSS: {result['peak_rss'] / 1024 / 1024:.1f} MiB (largest kiosk)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay kiosk traffic against VATS")
+    parser.add_argument("--trace", help="JSONL trace to replay instead of generating")
+    parser.add_argument("--write-trace", help="save the generated trace and exit")
+    parser.add_argument("--data", help="start from a copy of this data file")
+    parser.add_argument("--headsets", type=int, default=100, help="fleet size")
+    parser.add_argument("--events", type=int, default=2000, help="generated events")
+    parser.add_argument("--kiosks", type=int, default=1, help="kiosk processes")
+    parser.add_argument("--mode", choices=sorted(DRIVERS), default="core")
+    parser.add_argument(
+        "--speed", type=float, default=0, help="times real time, 0 = flat out"
+    )
+    parser.add_argument(
+        "--conflict-rate",
+        type=float,
+        default=0,
+        help="share of checkouts aimed at an account already in use",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    fleet = load_data(args.data, False) if args.data else make_fleet(args.headsets)
+    if args.trace:
+        trace = read_trace(args.trace)
+    else:
+        trace = generate_trace(
+            fleet, args.events, args.kiosks, args.seed, args.conflict_rate
+        )
+
+    if args.write_trace:
+        write_trace(trace, args.write_trace)
+        print(f"Wrote {len(trace)} events to {args.write_trace}")
+        return 0
+
+    print_report(run(trace, fleet, args.kiosks, args.mode, args.speed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""In-memory metrics for VATS, exported in the Prometheus text format.
+
+Metrics are updated from the same events that update the UI, so nothing
+here scans the fleet. Export them with ``start_http_server`` (localhost
+only) or ``write_textfile`` for node_exporter's textfile collector.
+"""
+
+import os
+import threading
+
+# Seconds; refreshes and saves of a kiosk-sized fleet land in the low buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+# ---------------- METRIC TYPES ----------------
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key):
+    if not key:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, lock):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self._lock = lock
+
+    def inc(self, amount=1, **labels):
+        key = label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def lines(self):
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(key)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[label_key(labels)] = value
+
+    def set_all(self, label, values, **labels):
+        """One series per ``values`` key under ``label``; missing ones drop to 0"""
+        with self._lock:
+            for key in self.values:
+                series = dict(key)
+                if series.pop(label, None) is not None and series == labels:
+                    self.values[key] = 0
+            for name, value in values.items():
+                self.values[label_key({**labels, label: name})] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, lock, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self._lock = lock
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.total += value
+            self.count += 1
+
+    def lines(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound}"}} {cumulative}'
+        yield f'{self.name}_bucket{{le="+Inf"}} {self.count}'
+        yield f"{self.name}_sum {self.total}"
+        yield f"{self.name}_count {self.count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text, self._lock))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(name, help_text, self._lock))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, self._lock, buckets))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in self._metrics:
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+
+# ---------------- VATS METRICS ----------------
+METRICS = MetricsRegistry()
+
+CHECKOUTS = METRICS.counter("vats_checkouts_total", "Headsets checked out.")
+RETURNS = METRICS.counter("vats_returns_total", "Headsets returned.")
+CONFLICTS = METRICS.counter(
+    "vats_conflicts_rejected_total", "Checkouts rejected by validation, by reason."
+)
+AVAILABLE = METRICS.gauge(
+    "vats_available_headsets", "Headsets free to check out, by site and model."
+)
+BLOCKED_ACCOUNTS = METRICS.gauge(
+    "vats_blocked_accounts", "Accounts whose idle headsets are blocked, by site."
+)
+REFRESH_SECONDS = METRICS.histogram(
+    "vats_refresh_seconds", "Time to refresh the headset views, including saving."
+)
+SAVE_SECONDS = METRICS.histogram("vats_save_seconds", "Time to save a site's data.")
+DATA_FILE_BYTES = METRICS.gauge(
+    "vats_data_file_bytes", "Size of the data file, by site."
+)
+
+
+def record_fleet(site, accounts):
+    """Copy a shard's incrementally maintained AccountIndex totals"""
+    AVAILABLE.set_all("model", accounts.available_by_model, site=site)
+    BLOCKED_ACCOUNTS.set(accounts.blocked_count, site=site)
+
+
+def record_save(site, path, seconds):
+    SAVE_SECONDS.observe(seconds)
+    DATA_FILE_BYTES.set(os.path.getsize(path), site=site)
+
+
+# ---------------- EXPORT ----------------
+def write_textfile(path):
+    """Write atomically so a collector never reads a partial file"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(METRICS.render())
+    os.replace(temp_path, path)
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread and return the server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = METRICS.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,71 @@
+from config import (
+    COLOR_ACCOUNT_BLOCKED,
+    COLOR_AVAILABLE,
+    COLOR_IN_USE,
+    DEFAULT_PRIORITY,
+    STATUS_ACCOUNT_IN_USE,
+    STATUS_AVAILABLE,
+    STATUS_IN_USE,
+)
+
+
+# ---------------- HEADSET MODEL ----------------
+class Headset:
+    """Model class"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def id(self):
+        return self.data["id"]
+
+    @property
+    def model(self):
+        return self.data["model"]
+
+    @property
+    def account_id(self):
+        return self.data["account_id"]
+
+    @property
+    def in_use(self):
+        return self.data["in_use"]
+
+    @in_use.setter
+    def in_use(self, value):
+        self.data["in_use"] = value
+
+    @property
+    def last_used(self):
+        return self.data["last_used"]
+
+    @last_used.setter
+    def last_used(self, value):
+        self.data["last_used"] = value
+
+    @property
+    def custom_priority(self):
+        return self.data.get("custom_priority")
+
+    @custom_priority.setter
+    def custom_priority(self, value):
+        self.data["custom_priority"] = value
+
+    def get_priority(self):
+        if self.custom_priority is not None:
+            return self.custom_priority
+        return DEFAULT_PRIORITY.get(self.model, 999)
+
+    def get_priority_display(self):
+        if self.custom_priority is not None:
+            return f"{self.custom_priority} (Custom)"
+        return f"{DEFAULT_PRIORITY.get(self.model, 999)} (Default)"
+
+    def get_status_info(self, used_accounts):
+        if self.in_use:
+            return STATUS_IN_USE, COLOR_IN_USE
+        elif self.account_id in used_accounts:
+            return STATUS_ACCOUNT_IN_USE, COLOR_ACCOUNT_BLOCKED
+        else:
+            return STATUS_AVAILABLE, COLOR_AVAILABLE
@@ -0,0 +1,185 @@
+import datetime
+
+from config import DEFAULT_PRIORITY, SCORING_POLICY, SCORING_POLICY_PARAMS
+
+
+# ---------------- HELPERS ----------------
+def utc_now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        # Hand-edited files may omit the offset; the app writes UTC
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def base_priority(headset):
+    if headset.get("custom_priority") is not None:
+        return headset["custom_priority"]
+    return DEFAULT_PRIORITY.get(headset["model"], 999)
+
+
+# ---------------- POLICIES ----------------
+class ScoringPolicy:
+    """Ranks available headsets, lower scores are suggested first.
+
+    Scores are tuples cached per headset id and record version (see
+    ``Shard.versions``) until the ``context_key`` or the parameters change.
+    """
+
+    name = "priority"
+
+    def __init__(self, **params):
+        self.params = dict(params)
+        self._cache = {}
+        self._context = None
+
+    def set_params(self, **params):
+        self.params.update(params)
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._context = None
+
+    def forget(self, headset_id):
+        self._cache.pop(headset_id, None)
+
+    def context_key(self, now):
+        """State outside the record that scores depend on"""
+        return None
+
+    def prepare(self, now):
+        """Drop cached scores if the context changed; call once per batch"""
+        context = self.context_key(now)
+        if context != self._context:
+            self._cache.clear()
+            self._context = context
+
+    def compute(self, headset, now):
+        return (base_priority(headset), headset["last_used"])
+
+    def score(self, headset, now, version=None):
+        if version is None:
+            return self.compute(headset, now)
+
+        cached = self._cache.get(headset["id"])
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        value = self.compute(headset, now)
+        self._cache[headset["id"]] = (version, value)
+        return value
+
+
+class PriorityPolicy(ScoringPolicy):
+    """Custom priority, then model default, then least recently used"""
+
+
+class WearLevelingPolicy(ScoringPolicy):
+    """Least cumulative usage first, priority breaks ties within a bucket"""
+
+    name = "wear_leveling"
+
+    def compute(self, headset, now):
+        bucket = max(self.params.get("bucket_hours", 1), 0) * 3600
+        used = headset.get("total_use_seconds", 0)
+        wear = int(used // bucket) if bucket else used
+        return (wear,) + super().compute(headset, now)
+
+
+class CooldownPolicy(ScoringPolicy):
+    """Headsets returned within ``minutes`` are suggested last"""
+
+    name = "cooldown"
+
+    def context_key(self, now):
+        # Re-evaluate cool-downs at most once a minute
+        return int(now.timestamp() // 60)
+
+    def compute(self, headset, now):
+        returned = parse_timestamp(headset.get("last_returned"))
+        window = datetime.timedelta(minutes=self.params.get("minutes", 15))
+        cooling = 1 if returned is not None and now - returned < window else 0
+        return (cooling,) + super().compute(headset, now)
+
+
+class TimeOfDayPolicy(ScoringPolicy):
+    """Prefers the models scheduled for the current local hour"""
+
+    name = "time_of_day"
+
+    def context_key(self, now):
+        return now.astimezone().hour
+
+    def preferred_models(self, hour):
+        for start, end, models in self.params.get("schedule", []):
+            if start <= hour < end:
+                return list(models)
+        return []
+
+    def compute(self, headset, now):
+        preferred = self.preferred_models(self.context_key(now))
+        if headset["model"] in preferred:
+            rank = preferred.index(headset["model"])
+        else:
+            rank = len(preferred)
+        return (rank,) + super().compute(headset, now)
+
+
+POLICIES = {
+    policy.name: policy
+    for policy in (PriorityPolicy, WearLevelingPolicy, CooldownPolicy, TimeOfDayPolicy)
+}
+
+
+def create_policy(name=None, **params):
+    name = name or SCORING_POLICY
+    if name not in POLICIES:
+        raise ValueError(
+            f"Unknown scoring policy '{name}'. Choose from: {', '.join(POLICIES)}"
+        )
+    options = dict(SCORING_POLICY_PARAMS.get(name, {}))
+    options.update(params)
+    return POLICIES[name](**options)
+
+
+# ---------------- BATCH SCORING ----------------
+def available_headsets(headsets):
+    used_accounts = {h["account_id"] for h in headsets if h["in_use"]}
+    return [
+        h for h in headsets if not h["in_use"] and h["account_id"] not in used_accounts
+    ]
+
+
+def batch_scores(headsets, policy, now=None, versions=None):
+    """Scores for ``headsets``, reusing cached ones for unchanged versions"""
+    now = now or utc_now()
+    policy.prepare(now)
+    versions = versions or {}
+    return [policy.score(h, now, versions.get(h["id"])) for h in headsets]
+
+
+def rank_headsets(headsets, policy, now=None, versions=None):
+    """Available headsets ordered best first according to ``policy``"""
+    available = available_headsets(headsets)
+    scores = batch_scores(available, policy, now, versions)
+    order = sorted(range(len(available)), key=scores.__getitem__)
+    return [available[i] for i in order]
+
+
+def best_headset(headsets, policy, now=None, versions=None):
+    """The first of ``rank_headsets`` without sorting the whole fleet"""
+    available = available_headsets(headsets)
+    if not available:
+        return None
+    scores = batch_scores(available, policy, now, versions)
+    return available[min(range(len(available)), key=scores.__getitem__)]
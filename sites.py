@@ -0,0 +1,272 @@
+import contextlib
+import datetime
+import itertools
+import json
+import os
+
+from accounts import AccountIndex
+from config import DATA_FILE, DEFAULT_SITE, SITE_SUMMARY_FILE, SITES
+from scoring import available_headsets, best_headset, create_policy, utc_now
+
+DEFAULT_SHARD = "default"
+
+# Record versions are unique across shards so one policy cache can serve all
+_versions = itertools.count(1)
+
+
+# ---------------- DATA HELPERS ----------------
+def sample_data():
+    return [
+        {
+            "id": "Quest3-001",
+            "model": "Quest3",
+            "account_id": "demo_account_1",
+            "last_used": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "in_use": False,
+        },
+        {
+            "id": "Quest2-001",
+            "model": "Quest2",
+            "account_id": "demo_account_2",
+            "last_used": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "in_use": False,
+        },
+        {
+            "id": "HTC-001",
+            "model": "HTC_Vive_XR",
+            "account_id": "demo_account_3",
+            "last_used": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "in_use": False,
+        },
+    ]
+
+
+def load_data(path=DATA_FILE, create_sample=True):
+    if not os.path.exists(path):
+        if not create_sample:
+            return []
+        data = sample_data()
+        save_data(data, path)
+        return data
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_data(data, path=DATA_FILE):
+    write_json_atomic(data, path)
+
+
+def write_json_atomic(data, path):
+    """Write to a temp file and rename, so readers never see half a file"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive lock on ``path``.lock, held across processes"""
+    with open(f"{path}.lock", "a") as f:
+        try:
+            import fcntl
+        except ImportError:  # Windows
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        # Closing the file releases the lock
+        yield
+
+
+# ---------------- SHARDS ----------------
+class Shard:
+    """Headsets of one site, read from disk on first access"""
+
+    def __init__(self, name, path, create_sample=False):
+        self.name = name
+        self.path = path
+        self.create_sample = create_sample
+        self.index = {}
+        self.versions = {}
+        self._accounts = None
+        self._headsets = None
+
+    @property
+    def loaded(self):
+        return self._headsets is not None
+
+    @property
+    def headsets(self):
+        if self._headsets is None:
+            self._headsets = load_data(self.path, self.create_sample)
+            self.index = {h["id"]: h for h in self._headsets}
+            self.versions = {h["id"]: next(_versions) for h in self._headsets}
+            self._accounts = AccountIndex(self._headsets)
+        return self._headsets
+
+    @property
+    def accounts(self):
+        self.headsets
+        return self._accounts
+
+    def find(self, headset_id):
+        self.headsets
+        return self.index.get(headset_id)
+
+    def add(self, headset_data):
+        self.headsets.append(headset_data)
+        self.index[headset_data["id"]] = headset_data
+        self.versions[headset_data["id"]] = next(_versions)
+        self._accounts.apply(headset_data)
+
+    def touch(self, headset_data):
+        """Record a state change of a headset already in this shard"""
+        self.versions[headset_data["id"]] = next(_versions)
+        self.accounts.apply(headset_data)
+
+    def remove(self, headset_ids):
+        self.headsets[:] = [h for h in self.headsets if h["id"] not in headset_ids]
+        for headset_id in headset_ids:
+            self.index.pop(headset_id, None)
+            self.versions.pop(headset_id, None)
+            self._accounts.discard(headset_id)
+
+    def replace(self, headset_id, headset_data):
+        old = self.find(headset_id)
+        if old is None:
+            return
+        for i, h in enumerate(self.headsets):
+            if h is old:
+                self.headsets[i] = headset_data
+                break
+        del self.index[headset_id]
+        del self.versions[headset_id]
+        self.index[headset_data["id"]] = headset_data
+        self.versions[headset_data["id"]] = next(_versions)
+        self._accounts.discard(headset_id)
+        self._accounts.apply(headset_data)
+
+    def summarize(self, policy):
+        available = available_headsets(self.headsets)
+        suggestion = best_headset(available, policy, versions=self.versions)
+        by_model = {}
+        for h in available:
+            by_model[h["model"]] = by_model.get(h["model"], 0) + 1
+        return {
+            "total": len(self.headsets),
+            "available": len(available),
+            "available_by_model": by_model,
+            "suggestion": dict(suggestion) if suggestion else None,
+        }
+
+    def save(self):
+        save_data(self.headsets, self.path)
+
+    def unload(self):
+        """Forget the in-memory copy so the next access re-reads the file"""
+        self._headsets = None
+
+
+class SiteRegistry:
+    """All shards known to this kiosk plus their persisted summaries.
+
+    Without configured ``SITES`` there is a single shard backed by
+    ``DATA_FILE``, which behaves exactly like the unsharded app. The
+    ``current`` shard is the one this kiosk edits; other kiosks may be
+    writing the rest, so their summaries and data are always re-read.
+    """
+
+    def __init__(self, sites=None, summary_path=SITE_SUMMARY_FILE, policy=None):
+        sites = SITES if sites is None else sites
+        if sites:
+            self.shards = {name: Shard(name, path) for name, path in sites.items()}
+        else:
+            self.shards = {
+                DEFAULT_SHARD: Shard(DEFAULT_SHARD, DATA_FILE, create_sample=True)
+            }
+        self.summary_path = summary_path
+        self.policy = policy or create_policy()
+        self.current = self.default_name()
+
+    @property
+    def names(self):
+        return list(self.shards)
+
+    @property
+    def sharded(self):
+        return len(self.shards) > 1
+
+    def default_name(self):
+        if DEFAULT_SITE in self.shards:
+            return DEFAULT_SITE
+        return next(iter(self.shards))
+
+    def get(self, name=None):
+        return self.shards[name or self.default_name()]
+
+    def select(self, name=None):
+        """Make ``name`` the shard this kiosk works on and return it"""
+        name = name or self.default_name()
+        if name != self.current:
+            # Another kiosk may have written it since we last looked
+            self.shards[name].unload()
+        self.current = name
+        return self.shards[name]
+
+    def read_summaries(self):
+        if not os.path.exists(self.summary_path):
+            return {}
+        with open(self.summary_path, "r") as f:
+            return json.load(f)
+
+    def write_summary(self, shard):
+        """Replace only ``shard``'s entry, keeping other kiosks' updates"""
+        summary = shard.summarize(self.policy)
+        with file_lock(self.summary_path):
+            summaries = self.read_summaries()
+            summaries[shard.name] = summary
+            write_json_atomic(summaries, self.summary_path)
+
+    def save(self, shard):
+        shard.save()
+        if self.sharded:
+            self.write_summary(shard)
+
+    def find_available(self):
+        """Best available headset in any site as (site, headset), else (None, None).
+
+        Other shards are compared by their stored summaries, read fresh
+        from disk; only the winning shard is re-read to confirm the
+        headset is still free.
+        """
+        now = utc_now()
+        self.policy.prepare(now)
+        summaries = self.read_summaries()
+        candidates = []
+        for name, shard in self.shards.items():
+            if name == self.current:
+                suggestion = best_headset(
+                    shard.headsets, self.policy, now, shard.versions
+                )
+            elif name in summaries:
+                suggestion = summaries[name]["suggestion"]
+            else:
+                shard.unload()
+                suggestion = shard.summarize(self.policy)["suggestion"]
+            if suggestion:
+                candidates.append((self.policy.score(suggestion, now), name))
+
+        for _, name in sorted(candidates):
+            shard = self.shards[name]
+            if name != self.current:
+                shard.unload()
+            best = best_headset(shard.headsets, self.policy, now, shard.versions)
+            if best is not None:
+                return name, best
+            # Summary was stale, nothing is free there any more
+            self.write_summary(shard)
+
+        return None, None
@@ -0,0 +1,140 @@
+"""Startup timing for VATS.
+
+Run ``python startup.py`` to launch the app offscreen, measure time to
+first paint and to a fully loaded inventory, and list the slowest imports
+from a ``python -X importtime`` run. Exits non-zero when first paint is
+over ``STARTUP_BUDGET_MS``.
+"""
+
+import sys
+import time
+
+# Only the marks run inside the app; runner modules are imported on demand
+REPORT_FLAG = "--startup-report"
+MARK_PREFIX = "startup: "
+
+_start = time.perf_counter()
+_enabled = REPORT_FLAG in sys.argv
+
+
+# ---------------- IN-APP MARKS ----------------
+def mark(name):
+    """Print a timing mark for the report runner, no-op in normal use"""
+    if _enabled:
+        elapsed = (time.perf_counter() - _start) * 1000
+        print(f"{MARK_PREFIX}{name} {elapsed:.1f}", flush=True)
+
+
+# ---------------- REPORT RUNNER ----------------
+def app_command(*python_args):
+    import os
+
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "VATS.py")
+    return [sys.executable, *python_args, app, REPORT_FLAG]
+
+
+def app_env(onscreen=False):
+    import os
+
+    env = dict(os.environ)
+    if not onscreen:
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def run_until_loaded(command, env, stderr):
+    """Run the app until its ``data_loaded`` mark, then end it.
+
+    Returns wall-clock ms from process launch to each mark it printed.
+    """
+    import subprocess
+
+    marks = {}
+    launched = time.perf_counter()
+    proc = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=stderr, env=env, text=True
+    )
+    try:
+        for line in proc.stdout:
+            if line.startswith(MARK_PREFIX):
+                name = line[len(MARK_PREFIX) :].split()[0]
+                marks[name] = (time.perf_counter() - launched) * 1000
+                if name == "data_loaded":
+                    break
+    finally:
+        proc.terminate()
+        proc.wait()
+    return marks
+
+
+def measure_marks(onscreen=False):
+    import subprocess
+
+    return run_until_loaded(app_command(), app_env(onscreen), subprocess.DEVNULL)
+
+
+def parse_importtime(text):
+    """(self_us, cumulative_us, module) rows from ``-X importtime`` output"""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        rows.append((int(parts[0]), int(parts[1]), parts[2].rstrip()))
+    return rows
+
+
+def measure_imports(onscreen=False):
+    import tempfile
+
+    with tempfile.TemporaryFile("w+") as stderr:
+        run_until_loaded(app_command("-X", "importtime"), app_env(onscreen), stderr)
+        stderr.seek(0)
+        return parse_importtime(stderr.read())
+
+
+def print_report(marks, imports, budget_ms, top):
+    print("Startup timeline (ms since launch)")
+    for name in ("imports_done", "window_built", "first_paint", "data_loaded"):
+        value = marks.get(name)
+        shown = "not observed" if value is None else f"{value:8.1f}"
+        print(f"  {name:<14}{shown}")
+
+    total_us = sum(row[0] for row in imports)
+    print(f"\nSlowest imports (total {total_us / 1000:.1f} ms)")
+    print(f"  {'self ms':>8} {'cumul ms':>9}  module")
+    for self_us, cumulative_us, module in sorted(imports, key=lambda r: -r[1])[:top]:
+        print(f"  {self_us / 1000:8.1f} {cumulative_us / 1000:9.1f} {module}")
+
+    first_paint = marks.get("first_paint")
+    if first_paint is None:
+        print("\nFirst paint was not observed")
+        return False
+    within = first_paint <= budget_ms
+    verdict = "within" if within else "OVER"
+    print(f"\nFirst paint {first_paint:.1f} ms is {verdict} the {budget_ms} ms budget")
+    return within
+
+
+def main(argv=None):
+    import argparse
+
+    from config import STARTUP_BUDGET_MS
+
+    parser = argparse.ArgumentParser(description="Measure VATS startup time")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="imports to list")
+    parser.add_argument(
+        "--onscreen", action="store_true", help="use the real display"
+    )
+    args = parser.parse_args(argv)
+
+    marks = measure_marks(args.onscreen)
+    imports = measure_imports(args.onscreen)
+    return 0 if print_report(marks, imports, args.budget, args.top) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import random
+
+from accounts import AccountIndex
+
+
+def make_headset(i, account_id, model="Quest3", in_use=False):
+    return {
+        "id": f"h{i}",
+        "model": model,
+        "account_id": account_id,
+        "last_used": f"2024-01-01T08:{i % 60:02d}:00+00:00",
+        "in_use": in_use,
+    }
+
+
+def recompute(headsets):
+    """Brute-force aggregates the index must agree with"""
+    used_accounts = {h["account_id"] for h in headsets if h["in_use"]}
+    available_by_model = {}
+    blocked = set()
+    accounts = {}
+    for h in headsets:
+        if not h["in_use"]:
+            if h["account_id"] in used_accounts:
+                blocked.add(h["account_id"])
+            else:
+                model = h["model"]
+                available_by_model[model] = available_by_model.get(model, 0) + 1
+        activity = max(h["last_used"], h.get("last_returned") or "")
+        entry = accounts.setdefault(
+            h["account_id"], {"total": 0, "holders": set(), "last_activity": ""}
+        )
+        entry["total"] += 1
+        if h["in_use"]:
+            entry["holders"].add(h["id"])
+        entry["last_activity"] = max(entry["last_activity"], activity)
+    return available_by_model, len(blocked), accounts
+
+
+def assert_matches(index, headsets):
+    available_by_model, blocked_count, accounts = recompute(headsets)
+    assert index.available_by_model == available_by_model
+    assert index.blocked_count == blocked_count
+    assert set(index.accounts) == set(accounts)
+    for account_id, expected in accounts.items():
+        summary = index.get(account_id)
+        assert summary.total == expected["total"]
+        assert summary.holders == expected["holders"]
+        assert summary.last_activity == expected["last_activity"]
+
+
+def test_blocked_account_has_no_available_models():
+    headsets = [
+        make_headset(0, "a", in_use=True),
+        make_headset(1, "a", model="Quest2"),
+        make_headset(2, "b", model="Quest2"),
+    ]
+    index = AccountIndex(headsets)
+
+    assert index.get("a").holder == "h0"
+    assert index.get("a").available_models == {}
+    assert index.get("a").blocked
+    assert index.available_by_model == {"Quest2": 1}
+    assert index.blocked_count == 1
+
+
+def test_take_dirty_reports_touched_accounts_once():
+    headsets = [make_headset(0, "a"), make_headset(1, "b")]
+    index = AccountIndex(headsets)
+    index.take_dirty()
+
+    headsets[0]["in_use"] = True
+    index.apply(headsets[0])
+
+    assert index.take_dirty() == {"a"}
+    assert index.take_dirty() == set()
+
+
+def test_random_changes_match_full_recompute():
+    rng = random.Random(1234)
+    models = ["Quest3", "Quest2", "HTC_Vive_XR"]
+    headsets = [
+        make_headset(i, f"acct{rng.randrange(8)}", rng.choice(models))
+        for i in range(30)
+    ]
+    index = AccountIndex(headsets)
+    next_id = len(headsets)
+
+    for step in range(5000):
+        action = rng.random()
+        if action < 0.1 and headsets:
+            removed = headsets.pop(rng.randrange(len(headsets)))
+            index.discard(removed["id"])
+        elif action < 0.2:
+            headset = make_headset(next_id, f"acct{rng.randrange(8)}")
+            next_id += 1
+            headsets.append(headset)
+            index.apply(headset)
+        elif headsets:
+            headset = rng.choice(headsets)
+            if action < 0.3:
+                headset["account_id"] = f"acct{rng.randrange(8)}"
+            elif action < 0.35:
+                headset["model"] = rng.choice(models)
+            else:
+                headset["in_use"] = not headset["in_use"]
+                headset["last_returned"] = f"2024-01-02T{step % 24:02d}:00:00+00:00"
+            index.apply(headset)
+
+        assert_matches(index, headsets)
@@ -0,0 +1,118 @@
+import datetime
+import random
+
+from config import DEFAULT_PRIORITY
+from scoring import best_headset, create_policy, parse_timestamp
+
+NOW = datetime.datetime(2024, 1, 1, 8, 14, 30, tzinfo=datetime.timezone.utc)
+
+
+def make_headset(i, model="Quest3", **fields):
+    headset = {
+        "id": f"h{i}",
+        "model": model,
+        "account_id": f"acct{i}",
+        "last_used": "2024-01-01T07:00:00+00:00",
+        "in_use": False,
+    }
+    headset.update(fields)
+    return headset
+
+
+def baseline_suggestion(headsets):
+    """The sort VATS used before scoring policies existed"""
+    used_accounts = {h["account_id"] for h in headsets if h["in_use"]}
+    available = [
+        h for h in headsets if not h["in_use"] and h["account_id"] not in used_accounts
+    ]
+    if not available:
+        return None
+
+    def get_priority(headset):
+        if "custom_priority" in headset:
+            return headset["custom_priority"]
+        return DEFAULT_PRIORITY.get(headset["model"], 999)
+
+    available.sort(key=lambda h: (get_priority(h), h["last_used"]))
+    return available[0]
+
+
+def test_naive_timestamp_is_utc():
+    parsed = parse_timestamp("2024-01-01T08:00:00")
+
+    assert parsed == datetime.datetime(2024, 1, 1, 8, tzinfo=datetime.timezone.utc)
+
+
+def test_version_bump_recomputes_score():
+    policy = create_policy("priority")
+    headset = make_headset(0)
+    policy.prepare(NOW)
+    first = policy.score(headset, NOW, version=1)
+
+    headset["custom_priority"] = 0
+    assert policy.score(headset, NOW, version=1) == first
+    assert policy.score(headset, NOW, version=2) == (0, headset["last_used"])
+
+
+def test_set_params_recomputes_score():
+    policy = create_policy("wear_leveling", bucket_hours=1)
+    headset = make_headset(0, total_use_seconds=7200)
+    policy.prepare(NOW)
+    assert policy.score(headset, NOW, version=1)[0] == 2
+
+    policy.set_params(bucket_hours=4)
+    policy.prepare(NOW)
+    assert policy.score(headset, NOW, version=1)[0] == 0
+
+
+def test_cooldown_cache_drops_when_minute_changes():
+    policy = create_policy("cooldown", minutes=15)
+    headset = make_headset(0, last_returned="2024-01-01T08:00:00+00:00")
+    policy.prepare(NOW)
+    assert policy.score(headset, NOW, version=1)[0] == 1
+
+    later = NOW + datetime.timedelta(seconds=20)
+    policy.prepare(later)
+    assert policy.score(headset, later, version=1)[0] == 1
+
+    next_minute = NOW + datetime.timedelta(seconds=40)
+    policy.prepare(next_minute)
+    assert policy.score(headset, next_minute, version=1)[0] == 0
+
+
+def test_time_of_day_cache_drops_when_hour_changes():
+    hour = NOW.astimezone().hour
+    policy = create_policy("time_of_day", schedule=[(hour, hour + 1, ["Quest2"])])
+    headset = make_headset(0, model="Quest3")
+    policy.prepare(NOW)
+    assert policy.score(headset, NOW, version=1)[0] == 1
+
+    next_hour = NOW + datetime.timedelta(hours=1)
+    policy.prepare(next_hour)
+    assert policy.score(headset, next_hour, version=1)[0] == 0
+
+
+def test_priority_best_headset_matches_baseline_sort():
+    rng = random.Random(7)
+    policy = create_policy("priority")
+    models = list(DEFAULT_PRIORITY) + ["Unknown"]
+
+    for _ in range(200):
+        headsets = []
+        for i in range(rng.randrange(1, 40)):
+            headset = make_headset(
+                i,
+                rng.choice(models),
+                account_id=f"acct{rng.randrange(10)}",
+                last_used=f"2024-01-01T0{rng.randrange(10)}:00:00+00:00",
+                in_use=rng.random() < 0.3,
+            )
+            if rng.random() < 0.2:
+                headset["custom_priority"] = rng.randint(1, 10)
+            headsets.append(headset)
+        versions = {h["id"]: rng.randrange(3) + 1 for h in headsets}
+        policy.clear_cache()
+
+        assert best_headset(headsets, policy, NOW, versions) is baseline_suggestion(
+            headsets
+        )